@@ -1,7 +1,8 @@
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import orjson
 import pandas as pd
-import re
 
 # Required non-empty fields (clean & drop if empty)
 REQUIRED_COLS = ["user_id", "name", "time", "rating", "text", "gmap_id"]
@@ -9,20 +10,22 @@ REQUIRED_COLS = ["user_id", "name", "time", "rating", "text", "gmap_id"]
 # Full, fixed output schema & order (guarantees headers, keeps pics/resp)
 OUTPUT_COLS = ["user_id", "name", "time", "rating", "text", "pics", "resp", "gmap_id"]
 
-# Tokens treated as empty (case-insensitive)
-EMPTY_TOKENS = {"", "nan", "none", "null", "n/a", "na"}
+# Tokens treated as empty (matched case-insensitively against the whole value)
+EMPTY_TOKENS = r"(?:|nan|none|null|n/a|na)"
 
-# Whitespace normalizers
-RE_ZERO_WIDTH = re.compile(r"[\u200B-\u200D\uFEFF]")
-RE_WS_MULTI   = re.compile(r"\s+")
+# Whitespace normalizers (RE2 syntax, run as Arrow compute kernels)
+ZERO_WIDTH = "[\u200B-\u200D\uFEFF]"
+# RE2's \s is ASCII-only; add the Unicode separators so this matches what Python's \s did
+WS_MULTI   = r"[\s\v\x1c-\x1f\x85\p{Z}]+"
 
 def _clean_string_series(s: pd.Series) -> pd.Series:
-    s = s.astype("string")
-    s = s.str.replace(RE_ZERO_WIDTH, "", regex=True)
-    s = s.str.replace(RE_WS_MULTI, " ", regex=True)
+    # Arrow-backed strings: each step is a vectorized C++ kernel, not a per-value Python loop
+    s = s.astype("string[pyarrow]")
+    s = s.str.replace(ZERO_WIDTH, "", regex=True)
+    s = s.str.replace(WS_MULTI, " ", regex=True)
     s = s.str.strip()
-    lower = s.str.lower()
-    s = s.mask(lower.isin(EMPTY_TOKENS))
+    # Case-insensitive regex match on Arrow; no lowercase copy of the column
+    s = s.mask(s.str.fullmatch(EMPTY_TOKENS, case=False, na=False))
     return s
 
 def _clean_chunk(df: pd.DataFrame) -> pd.DataFrame:
@@ -57,7 +60,23 @@ def _write_chunk(out_path: Path, df: pd.DataFrame, wrote_header_flag: dict):
     )
     wrote_header_flag["done"] = True
 
-def json_to_clean_csv(input_file: str, output_file: str, chunksize: int = 100_000):
+def _iter_jsonl_chunks(in_path: Path, chunksize: int):
+    batch = []
+    with open(in_path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = orjson.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("Expected one JSON object per line")
+            batch.append(record)
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch)
+                batch = []
+    if batch:
+        yield pd.DataFrame(batch)
+
+def json_to_clean_csv(input_file: str, output_file: str, chunksize: int = 500_000):
     in_path = Path(input_file)
     out_path = Path(output_file)
 
@@ -68,13 +87,20 @@ def json_to_clean_csv(input_file: str, output_file: str, chunksize: int = 100_00
     total_in = total_out = 0
     wrote_header = {"done": False}
 
-    # Try JSON Lines (streaming)
+    # Try JSON Lines (streaming); the previous chunk is written while the next one is read & cleaned
     try:
-        for chunk in pd.read_json(in_path, lines=True, chunksize=chunksize):
-            total_in += len(chunk)
-            cleaned = _clean_chunk(chunk)
-            total_out += len(cleaned)
-            _write_chunk(out_path, cleaned, wrote_header)
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            pending = None
+            for chunk in _iter_jsonl_chunks(in_path, chunksize):
+                total_in += len(chunk)
+                cleaned = _clean_chunk(chunk)
+                total_out += len(cleaned)
+                # Single writer: wait for the previous write before queuing the next
+                if pending is not None:
+                    pending.result()
+                pending = writer.submit(_write_chunk, out_path, cleaned, wrote_header)
+            if pending is not None:
+                pending.result()
         if total_in > 0:
             print(f"[JSONL mode] Rows in: {total_in}, rows out: {total_out}, removed: {total_in - total_out}")
             print(f"Clean CSV saved to: {out_path}")
@@ -84,7 +110,7 @@ def json_to_clean_csv(input_file: str, output_file: str, chunksize: int = 100_00
 
     # Fallback: array JSON (loads whole file)
     try:
-        df = pd.read_json(in_path)
+        df = pd.DataFrame(orjson.loads(in_path.read_bytes()))
         total_in = len(df)
         cleaned = _clean_chunk(df)
         total_out = len(cleaned)
@@ -103,6 +129,6 @@ if __name__ == "__main__":
     ap = argparse.ArgumentParser(description="Convert reviews JSON/JSONL to a cleaned CSV with stable headers.")
     ap.add_argument("input_file", help="Path to input JSON/JSONL file")
     ap.add_argument("output_file", help="Path to output CSV")
-    ap.add_argument("--chunksize", type=int, default=100000, help="Chunk size for JSONL streaming")
+    ap.add_argument("--chunksize", type=int, default=500000, help="Chunk size for JSONL streaming")
     args = ap.parse_args()
     json_to_clean_csv(args.input_file, args.output_file, args.chunksize)
\ No newline at end of file
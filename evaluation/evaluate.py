@@ -1,4 +1,5 @@
 import argparse
+import numpy as np
 import pandas as pd
 import torch
 from sklearn.metrics import classification_report, confusion_matrix
@@ -15,6 +16,7 @@ parser.add_argument("--model_path", type=str, required=True, help="Path to pretr
 parser.add_argument("--data_path", type=str, required=True, help="Path to CSV dataset with 'text' and 'label' columns")
 parser.add_argument("--text_col", type=str, default="text", help="Name of the text column in dataset")
 parser.add_argument("--label_col", type=str, default="label", help="Name of the label column in dataset")
+parser.add_argument("--compile", action="store_true", help="Compile the model with torch.compile (pays off on large datasets)")
 args = parser.parse_args()
 
 # ------------------------------------------------------------
@@ -36,20 +38,37 @@ model = AutoModelForSequenceClassification.from_pretrained(args.model_path)
 model.to(device)
 model.eval()
 
+# Half precision on GPU (fp16 weights, TF32 for any remaining fp32 matmuls); bf16 autocast on CPU
+if device.type == "cuda":
+    model = model.half()
+    torch.backends.cuda.matmul.allow_tf32 = True
+amp_dtype = torch.float16 if device.type == "cuda" else torch.bfloat16
+
+# Length-bucketed batches have varying shapes, so compile with dynamic shapes
+if args.compile:
+    model = torch.compile(model, dynamic=True)
+
 # ------------------------------------------------------------
 # Run inference
 # ------------------------------------------------------------
-batch_size = 16
+batch_size = 64
 all_preds = []
 
-with torch.no_grad():
-    for i in range(0, len(texts), batch_size):
-        batch_texts = texts[i:i+batch_size]
+# Sort by length so each batch pads only to its own longest text; restored after inference
+order = np.argsort([len(t) for t in texts], kind="stable")
+inv = np.argsort(order)
+texts_sorted = [texts[i] for i in order]
+
+with torch.inference_mode(), torch.autocast(device_type=device.type, dtype=amp_dtype):
+    for i in range(0, len(texts_sorted), batch_size):
+        batch_texts = texts_sorted[i:i+batch_size]
         encodings = tokenizer(batch_texts, padding=True, truncation=True, return_tensors="pt").to(device)
         outputs = model(**encodings)
         preds = torch.argmax(outputs.logits, dim=1)
         all_preds.extend(preds.cpu().numpy())
 
+all_preds = np.array(all_preds)[inv]
+
 # ------------------------------------------------------------
 # Evaluation metrics
 # ------------------------------------------------------------
@@ -1,8 +1,19 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
+import atexit
+import csv
+import hashlib
 import io
 import os
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
+import shutil
+import tempfile
+import threading
+from itertools import islice
+import torch
+import pyarrow as pa
+from pyarrow import csv as pacsv
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
 # Use conda install pytorch torchvision torchaudio cpuonly -c pytorch if no GPU
 # use conda install pytorch torchvision torchaudio pytorch-cuda=12.1 -c pytorch -c nvidia if u have Nvidia GPU
@@ -38,62 +49,224 @@ st.subheader("Google Reviews Noise Filter")
 @st.cache_resource
 def load_model():
     model_path = "../debert-v12"
-    tokenizer = AutoTokenizer.from_pretrained(model_path)
-    model = AutoModelForSequenceClassification.from_pretrained(model_path)
-    return pipeline("text-classification", model=model, tokenizer=tokenizer)
+    onnx_path = os.path.join(model_path, "onnx")
+    tokenizer = AutoTokenizer.from_pretrained(model_path, use_fast=True)
 
-classifier = load_model()
+    # On CPU-only hosts, prefer the int8 ONNX model (built by quantize.py) for fast inference
+    if not torch.cuda.is_available() and os.path.exists(os.path.join(onnx_path, "model.int8.onnx")):
+        # Imported here so onnxruntime/optimum are only needed when the int8 model is used
+        import onnxruntime as ort
+        from optimum.onnxruntime import ORTModelForSequenceClassification
 
-uploaded_file = st.file_uploader("Upload a CSV file", type=["csv"])
+        weights_file = os.path.join(onnx_path, "model.int8.onnx")
+        session_options = ort.SessionOptions()
+        session_options.intra_op_num_threads = os.cpu_count()
+        model = ORTModelForSequenceClassification.from_pretrained(
+            onnx_path,
+            file_name="model.int8.onnx",
+            provider="CPUExecutionProvider",
+            session_options=session_options,
+        )
+    else:
+        weights_file = next(
+            (os.path.join(model_path, f) for f in ("model.safetensors", "pytorch_model.bin")
+             if os.path.exists(os.path.join(model_path, f))),
+            model_path,
+        )
+        model = AutoModelForSequenceClassification.from_pretrained(model_path)
+        model.to("cuda" if torch.cuda.is_available() else "cpu")
+        model.eval()
 
-if uploaded_file:
-    df = pd.read_csv(uploaded_file, encoding="latin-1")
+        # Opt-in (JOFC_COMPILE=1): compiling needs a supported torch/Python/compiler setup and slows
+        # the first upload. Failures, at compile time or on the first forward, fall back to eager
+        if os.environ.get("JOFC_COMPILE") == "1":
+            try:
+                import torch._dynamo
+                torch._dynamo.config.suppress_errors = True
+                # Batch shapes vary, so dynamic
+                model.compile(dynamic=True)
+            except (ImportError, RuntimeError):
+                pass
 
+    # Identifies which weights produced the labels (file + mtime), for keying cached outputs
+    model_id = f"{os.path.abspath(weights_file)}:{os.path.getmtime(weights_file)}"
+    return tokenizer, model, model_id
 
-    if "text" not in df.columns:
-        st.error("CSV must contain a 'text' column")
-    else:
-        # Run classification
-        predictions = classifier(df["text"].tolist(), truncation=True)
-        df["category"] = [pred["label"] for pred in predictions]
-
-        # Count categories
-        counts = df["category"].value_counts().to_dict()
-
-        st.write("### Category Counts:")
-
-        # Map Hugging Face labels to human-friendly names
-        category_info = {
-            "LABEL_0": ("0: Valid", "A genuine review about the location, describing food, service, atmosphere, or experience."),
-            "LABEL_1": ("1: Spam/Advertisement", "Contains promotional content, links, phone numbers, or marketing language like 'visit', 'discount', 'special offer'. / Talks about unrelated topics (phones, politics, news)."),
-            "LABEL_2": ("2: Low Quality", "Nonsense, repetitive, very short, or generic ('Good', 'Nice', 'Ok!!!')."),
-            "LABEL_3": ("3: Rant Without Visit", "Reviewer complains or gives opinion but admits they never visited (e.g., 'Never been here but...').")
-        }
-
-        # Show metrics
-        col1, col2, col3, col4 = st.columns(4)
-        for i, col in enumerate([col1, col2, col3, col4]):
-            label_key = f"LABEL_{i}"
-            with col:
-                st.metric(category_info[label_key][0], counts.get(label_key, 0))
-                st.markdown(
-                    f"<div class='category-card'>"
-                    f"<div class='category-desc'>{category_info[label_key][1]}</div>"
-                    f"</div>",
-                    unsafe_allow_html=True
-                )
-
-        # Get original filename without extension
-        base_name = os.path.splitext(uploaded_file.name)[0]
-        output_filename = f"{base_name}_labelled.csv"
-
-        # Download classified CSV
-        csv_bytes = df.to_csv(index=False).encode("utf-8")
+tokenizer, model, model_id = load_model()
+
+CATEGORY_LABELS = ["LABEL_0", "LABEL_1", "LABEL_2", "LABEL_3"]
+
+# Label codes already predicted per review text, shared across reruns and uploads
+LABEL_CACHE_MAX = 100_000
+
+# Shared by every session, so all access goes through the lock; one cache per loaded model
+@st.cache_resource
+def load_label_cache(model_id):
+    return {}, threading.Lock()
+
+label_cache, label_cache_lock = load_label_cache(model_id)
+
+# Classify only texts not seen before and return int8 label codes (i -> LABEL_i)
+def classify(texts, batch_size=32):
+    # Work on a local text -> code map so other sessions' evictions can't pull entries from under us
+    distinct = set(texts)
+    with label_cache_lock:
+        known = {t: label_cache[t] for t in distinct if t in label_cache}
+    unseen = [t for t in distinct if t not in known]
+    fresh = {}
+    if unseen:
+        # Tokenize everything in one fast-tokenizer call, then batch by token length
+        # so each batch pads only to its own longest text
+        enc = tokenizer(unseen, truncation=True, padding=False)
+        order = sorted(range(len(unseen)), key=lambda i: len(enc["input_ids"][i]))
+        with torch.inference_mode():
+            for start in range(0, len(order), batch_size):
+                idx = order[start:start + batch_size]
+                batch = tokenizer.pad({k: [v[i] for i in idx] for k, v in enc.items()}, return_tensors="pt")
+                logits = model(**batch.to(model.device)).logits
+                for i, code in zip(idx, logits.argmax(-1).tolist()):
+                    fresh[unseen[i]] = code
+    known.update(fresh)
+    codes = np.fromiter((known[t] for t in texts), dtype=np.int8, count=len(texts))
+
+    # Merge new predictions, then evict the oldest entries once the cache is over its cap
+    with label_cache_lock:
+        label_cache.update(fresh)
+        overflow = len(label_cache) - LABEL_CACHE_MAX
+        if overflow > 0:
+            for text in list(islice(label_cache, overflow)):
+                del label_cache[text]
+    return codes
+
+# Labelled CSVs live in a per-process directory (removed on exit), newest files kept
+CSV_CACHE_MAX_FILES = 20
+
+@st.cache_resource
+def load_csv_cache():
+    cache_dir = tempfile.mkdtemp(prefix="jofc_")
+    atexit.register(shutil.rmtree, cache_dir, ignore_errors=True)
+    return cache_dir, threading.Lock()
+
+csv_cache_dir, csv_cache_lock = load_csv_cache()
+
+# Write the labelled CSV once per (upload, model); reruns just reopen the file
+def open_labelled_csv(file_key, df):
+    name = hashlib.md5(f"{file_key}:{model_id}".encode("utf-8")).hexdigest()
+    path = os.path.join(csv_cache_dir, f"{name}.csv")
+    with csv_cache_lock:
+        if not os.path.exists(path):
+            # Write to a temp name first so a failed write never leaves a partial file behind
+            tmp_path = f"{path}.tmp"
+            df.to_csv(tmp_path, index=False, encoding="utf-8")
+            os.replace(tmp_path, path)
+
+            # Drop the oldest files beyond the cap
+            files = sorted(
+                (os.path.join(csv_cache_dir, f) for f in os.listdir(csv_cache_dir) if f.endswith(".csv")),
+                key=os.path.getmtime,
+                reverse=True,
+            )
+            for old_path in files[CSV_CACHE_MAX_FILES:]:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+        # Opened under the lock so eviction by another session can't remove it first
+        return open(path, "rb")
+
+# Metrics + download; a fragment so widget clicks rerun only this block, not classification
+@st.fragment
+def show_results(df, counts, file_name, file_key):
+    st.write("### Category Counts:")
+
+    # Map Hugging Face labels to human-friendly names
+    category_info = {
+        "LABEL_0": ("0: Valid", "A genuine review about the location, describing food, service, atmosphere, or experience."),
+        "LABEL_1": ("1: Spam/Advertisement", "Contains promotional content, links, phone numbers, or marketing language like 'visit', 'discount', 'special offer'. / Talks about unrelated topics (phones, politics, news)."),
+        "LABEL_2": ("2: Low Quality", "Nonsense, repetitive, very short, or generic ('Good', 'Nice', 'Ok!!!')."),
+        "LABEL_3": ("3: Rant Without Visit", "Reviewer complains or gives opinion but admits they never visited (e.g., 'Never been here but...').")
+    }
+
+    # Show metrics
+    col1, col2, col3, col4 = st.columns(4)
+    for i, col in enumerate([col1, col2, col3, col4]):
+        label_key = f"LABEL_{i}"
+        with col:
+            st.metric(category_info[label_key][0], counts.get(label_key, 0))
+            st.markdown(
+                f"<div class='category-card'>"
+                f"<div class='category-desc'>{category_info[label_key][1]}</div>"
+                f"</div>",
+                unsafe_allow_html=True
+            )
+
+    # Get original filename without extension
+    base_name = os.path.splitext(file_name)[0]
+    output_filename = f"{base_name}_labelled.csv"
+
+    # Download classified CSV
+    with open_labelled_csv(file_key, df) as csv_file:
         st.download_button(
             label=f"Download {output_filename}",
-            data=csv_bytes,
+            data=csv_file,
             file_name=output_filename,
             mime="text/csv"
         )
+
+# Column names from the header row only; leaves the file rewound for the full parse
+def read_csv_header(f):
+    f.seek(0)
+    wrapper = io.TextIOWrapper(f, encoding="latin-1", newline="")
+    try:
+        header = next(csv.reader(wrapper), [])
+    finally:
+        # Detach so closing the wrapper doesn't close the uploaded file
+        wrapper.detach()
+    f.seek(0)
+    return header
+
+uploaded_file = st.file_uploader("Upload a CSV file", type=["csv"])
+
+if uploaded_file:
+    # Parse & classify once per distinct upload; reruns reuse the result kept in session_state
+    file_key = hashlib.md5(uploaded_file.getvalue()).hexdigest()
+    if (st.session_state.get("file_key"), st.session_state.get("model_id")) != (file_key, model_id):
+        df = counts = error = None
+        try:
+            # Multithreaded Arrow parser; newlines_in_values keeps multi-line reviews intact.
+            # Every column is read as a string: Arrow infers types from the first block only, so
+            # sparse or mixed columns would fail later, and pass-through values are written back as-is
+            header = read_csv_header(uploaded_file)
+            table = pacsv.read_csv(
+                uploaded_file,
+                read_options=pacsv.ReadOptions(encoding="latin-1", use_threads=True, block_size=8 << 20),
+                parse_options=pacsv.ParseOptions(newlines_in_values=True),
+                convert_options=pacsv.ConvertOptions(column_types={name: pa.large_string() for name in header}),
+            )
+        except pa.ArrowInvalid as e:
+            error = f"Could not parse CSV: {e}"
+        else:
+            if "text" not in table.column_names:
+                error = "CSV must contain a 'text' column"
+
+        if error is None:
+            # Keep columns Arrow-backed (pd.ArrowDtype) instead of converting to object strings
+            df = table.to_pandas(split_blocks=True, self_destruct=True, types_mapper=pd.ArrowDtype)
+            del table
+            texts = df["text"].to_numpy(na_value="").tolist()
+
+            # Run classification; store the category as int8 codes, not per-row label strings
+            codes = classify(texts)
+            df["category"] = pd.Categorical.from_codes(codes, categories=CATEGORY_LABELS)
+
+            # Count categories: a 4-bin histogram over the label codes
+            counts = dict(zip(CATEGORY_LABELS, np.bincount(codes, minlength=len(CATEGORY_LABELS)).tolist()))
+
+        st.session_state.update(file_key=file_key, model_id=model_id, df=df, counts=counts, error=error)
+
+    if st.session_state["error"] is not None:
+        st.error(st.session_state["error"])
+    else:
+        show_results(st.session_state["df"], st.session_state["counts"], uploaded_file.name, file_key)
 else:
     st.info("Please upload a CSV file to begin.")
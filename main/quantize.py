@@ -0,0 +1,30 @@
+import argparse
+import os
+from onnxruntime.quantization import quantize_dynamic, QuantType
+from optimum.onnxruntime import ORTModelForSequenceClassification
+
+# ------------------------------------------------------------
+# Parse arguments
+# ------------------------------------------------------------
+parser = argparse.ArgumentParser(description="Export the fine-tuned model to ONNX and quantize it to int8 for CPU serving.")
+parser.add_argument("--model_path", type=str, default="../debert-v12", help="Path to pretrained model folder")
+parser.add_argument("--output_dir", type=str, default=None, help="Where to write the ONNX files (default: <model_path>/onnx)")
+args = parser.parse_args()
+
+output_dir = args.output_dir or os.path.join(args.model_path, "onnx")
+
+# ------------------------------------------------------------
+# Export fp32 ONNX graph
+# ------------------------------------------------------------
+model = ORTModelForSequenceClassification.from_pretrained(args.model_path, export=True)
+model.save_pretrained(output_dir)
+
+# ------------------------------------------------------------
+# Dynamic int8 quantization (weights int8, activations quantized at runtime)
+# ------------------------------------------------------------
+quantize_dynamic(
+    os.path.join(output_dir, "model.onnx"),
+    os.path.join(output_dir, "model.int8.onnx"),
+    weight_type=QuantType.QInt8,
+)
+print(f"Quantized model saved to: {os.path.join(output_dir, 'model.int8.onnx')}")